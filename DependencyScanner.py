@@ -1,77 +1,271 @@
 #!/usr/bin/python3
 from zipfile import ZipFile
-from glob import glob
 from os.path import join, split, splitext, exists, basename, isdir, dirname, abspath
 import sys
 import argparse
 from pathlib import Path
-from json import load
 import re
 import os
 import traceback
 import shutil
+import atexit
+import struct
+import zlib
+import mmap
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from codecs import BOM_UTF8
+
+# orjson is optional, fall back to the standard library when it isn't installed
+try:
+    from orjson import loads as _jsonLoads
+except ImportError:
+    from json import loads as _jsonLoads
+
+def loadJson(blob: bytes):
+    # orjson rejects a leading byte order mark, which some meta.json files have
+    if blob.startswith(BOM_UTF8):
+        blob = blob[len(BOM_UTF8):]
+    return _jsonLoads(blob)
+
+# Get the dependency names from the contents of a meta.json
+def getDependencyKeys(blob: bytes) -> set:
+    data = loadJson(blob)
+    if 'dependencies' not in data:
+        return set()
+    return set(data['dependencies'].keys())
+
+# The output file is opened once and written through a buffer, closed at exit
+_OUT_FH = None
+
+def _ensure_out(path: str):
+    global _OUT_FH
+    if _OUT_FH is None or _OUT_FH.name != path:
+        _close_out()
+        _OUT_FH = open(path, 'a', encoding='utf-8', buffering=1 << 16)
+    return _OUT_FH
+
+def _close_out():
+    global _OUT_FH
+    if _OUT_FH is not None:
+        _OUT_FH.close()
+        _OUT_FH = None
+
+atexit.register(_close_out)
 
 def dpPrint(text: str, toFile: str = ''):
-    print(text, flush=True)
+    print(text)
     if toFile:
         try:
-            with open(toFile, 'a', encoding='utf-8') as f:
-                f.write(text + '\n')
+            _ensure_out(toFile).write(text + '\n')
         except Exception as error:
             print(f"ERROR, failed to write to {toFile}: {error}", file=sys.stderr, flush=True)
             return
 
-def check_name_variation(varName, dependenciesList):
+# Check whether a var is used as a dependency, either directly or through a .latest reference.
+# dependencies should be a set or dict so the lookups are constant time
+def check_name_variation(varName, dependencies):
     parts = varName.split('.')
     if parts[-1].isdigit() or parts[-1] == 'latest':
         baseName = '.'.join(parts[:-1])
     else:
         baseName = varName
-    return varName in dependenciesList or f'{baseName}.latest' in dependenciesList
+    return varName in dependencies or f'{baseName}.latest' in dependencies
+
+_EOCD_SIGNATURE = b'PK\x05\x06'
+_CENTRAL_DIR_SIGNATURE = b'PK\x01\x02'
+_EOCD_STRUCT = struct.Struct('<4s4H2LH')
+_CENTRAL_DIR_STRUCT = struct.Struct('<4s6H3L5H2L')
+_LOCAL_HEADER_STRUCT = struct.Struct('<4s5H3L2H')
+
+# Read a single member by locating it through the central directory only, so the
+# rest of the archive is never parsed. Raises KeyError if the member is missing
+# and returns None for archives that need the full ZipFile treatment (zip64,
+# encryption, unusual compression or anything that doesn't look right)
+def _read_zip_member(varFile: str, memberName: bytes) -> bytes|None:
+    with open(varFile, 'rb') as f:
+        fileSize = f.seek(0, os.SEEK_END)
+        tailSize = min(fileSize, _EOCD_STRUCT.size + 0xFFFF)
+        f.seek(fileSize - tailSize)
+        tail = f.read(tailSize)
+        eocdIndex = tail.rfind(_EOCD_SIGNATURE)
+        if eocdIndex < 0 or len(tail) - eocdIndex < _EOCD_STRUCT.size:
+            return None
+
+        _, _, _, _, entryCount, dirSize, dirOffset, _ = _EOCD_STRUCT.unpack_from(tail, eocdIndex)
+        if entryCount == 0xFFFF or dirSize == 0xFFFFFFFF or dirOffset == 0xFFFFFFFF:
+            return None
+
+        # Account for any data prepended to the archive
+        eocdPosition = fileSize - tailSize + eocdIndex
+        archiveStart = eocdPosition - dirSize - dirOffset
+        if archiveStart < 0:
+            return None
+        f.seek(archiveStart + dirOffset)
+        centralDir = f.read(dirSize)
+        if len(centralDir) != dirSize:
+            return None
+
+        # Vars can hold thousands of entries, so rather than unpacking each one, search
+        # for the name and check that an entry header with that name length sits right
+        # before it. Searching from the end makes later entries win, the same as
+        # ZipFile does for duplicate names
+        member = None
+        nameStart = len(centralDir)
+        while member is None:
+            nameStart = centralDir.rfind(memberName, 0, nameStart)
+            if nameStart < 0:
+                break
+            entryStart = nameStart - _CENTRAL_DIR_STRUCT.size
+            if entryStart < 0 or centralDir[entryStart:entryStart + 4] != _CENTRAL_DIR_SIGNATURE:
+                continue
+            entry = _CENTRAL_DIR_STRUCT.unpack_from(centralDir, entryStart)
+            if entry[10] == len(memberName):
+                member = entry
+
+        if member is None:
+            raise KeyError(memberName)
+
+        flags, method, crc, compressedSize, size, headerOffset = member[3], member[4], member[7], member[8], member[9], member[16]
+        if flags & 0x1 or method not in (0, 8):
+            return None
+
+        f.seek(archiveStart + headerOffset)
+        header = f.read(_LOCAL_HEADER_STRUCT.size)
+        if len(header) != _LOCAL_HEADER_STRUCT.size:
+            return None
+        localHeader = _LOCAL_HEADER_STRUCT.unpack(header)
+        if localHeader[0] != b'PK\x03\x04':
+            return None
+        f.seek(localHeader[9] + localHeader[10], os.SEEK_CUR)
+        blob = f.read(compressedSize)
+
+    if method == 8:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        blob = decompressor.decompress(blob) + decompressor.flush()
+    if len(blob) != size or zlib.crc32(blob) != crc:
+        return None
+    return blob
 
 def getDependencies(varFile: str) -> tuple[Exception|None, set]:
     try:
-        with ZipFile(varFile) as myzip:
-            try:
-                with myzip.open('meta.json') as metaJson:
-                    data = load(metaJson)
-            except KeyError:
-                # meta.json not found in the zip
-                return Exception(f"meta.json not found in {varFile}"), set()
-            finally:
-                myzip.close()
-
-        if 'dependencies' not in data:
-            return None, set()
-        return None, set(data['dependencies'].keys())
+        try:
+            blob = _read_zip_member(varFile, b'meta.json')
+            if blob is None:
+                with ZipFile(varFile) as myzip:
+                    with myzip.open('meta.json') as metaJson:
+                        blob = metaJson.read()
+        except KeyError:
+            # meta.json not found in the zip
+            return Exception(f"meta.json not found in {varFile}"), set()
+        return None, getDependencyKeys(blob)
     except Exception as error:
         return error, set()
 
-# Safely get all files matching a pattern
-def safe_glob(pattern):
+# Recursively yield all files and folders below root with the given extension(s).
+# Hidden entries are skipped and folder symlinks followed, the same as
+# glob('**/*.ext', recursive=True), but with a single scandir call per folder
+def iter_files(root: str, extensions: str|tuple):
+    if isinstance(extensions, str):
+        extensions = (extensions,)
+    extensions = tuple(os.path.normcase(extension) for extension in extensions)
+    stack = [root]
+    visitedLinks = set()
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if os.path.normcase(entry.name).endswith(extensions):
+                    yield entry.path
+                try:
+                    if not entry.is_dir():
+                        continue
+                    if entry.is_symlink():
+                        # Guard against symlink loops
+                        realPath = os.path.realpath(entry.path)
+                        if realPath in visitedLinks:
+                            continue
+                        visitedLinks.add(realPath)
+                except OSError:
+                    continue
+                stack.append(entry.path)
+
+# Safely get all files and folders with the given extension(s) below a folder
+def safe_find(root: str, extensions: str|tuple) -> list:
     try:
-        return glob(pattern, recursive=True)
+        return list(iter_files(root, extensions))
     except Exception as e:
-        dpPrint(f"WARNING: Error while searching for files matching {pattern}: {e}", args.output)
+        dpPrint(f"WARNING: Error while searching for {extensions} files in {root}: {e}", args.output)
         return []
 
-# Get all dependencies listed in presets
-def getPresetDependencies(customPath: str) -> dict:
-    allDependencies = {}
+# Find the vars and, optionally, the presets of a VaM folder. Without an
+# AddonPackages folder the whole folder is searched, so presets are picked up
+# in the same pass instead of walking Custom a second time
+def scanVamFolder(directoryPath: str, includePresets: bool = True) -> tuple[list, list]:
+    addon_path = join(directoryPath, 'AddonPackages')
+    customPathFull = join(directoryPath, 'Custom')
+    presets = []
+
+    if exists(addon_path):
+        vars = safe_find(addon_path, '.var')
+        if includePresets and exists(customPathFull):
+            presets = safe_find(customPathFull, '.vap')
+        return vars, presets
+
+    dpPrint(f"WARNING: AddonPackages path does not exist: {addon_path}", args.output)
+    # Try directly in the directory instead
+    if not includePresets:
+        return safe_find(directoryPath, '.var'), presets
+
+    vars = []
+    customPrefix = os.path.normcase(customPathFull + os.sep)
+    for found in safe_find(directoryPath, ('.var', '.vap')):
+        found_case = os.path.normcase(found)
+        if found_case.endswith('.var'):
+            vars.append(found)
+        elif found_case.startswith(customPrefix):
+            presets.append(found)
+    return vars, presets
+
+# Start pool workers without a plain fork, which isn't safe once other threads are running
+# (checkMissingReferences walks the source folder in the background while vars are read)
+_POOL_CONTEXT = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+# Matches "Creator.Package.Version:/path" references inside preset files
+_PRESET_RE = re.compile(rb'"([^"]+):/[^"]*"')
+
+# Get all dependencies listed in presets. Presets already found by scanVamFolder
+# can be passed in to skip searching the Custom folder again
+def getPresetDependencies(customPath: str, presets: list|None = None) -> dict:
+    allDependencies = defaultdict(set)
     try:
         customPathFull = join(customPath, 'Custom')
         if not exists(customPathFull):
             dpPrint(f"WARNING: Custom path does not exist: {customPathFull}", args.output)
-            return allDependencies
+            return dict(allDependencies)
 
-        presets = sorted(safe_glob(join(customPathFull, '**/*.vap')))
+        if presets is None:
+            presets = safe_find(customPathFull, '.vap')
+        presets = sorted(presets)
         dpPrint(f"Found {len(presets)} preset files in {customPathFull}", args.output)
 
         for vap in presets:
             try:  
-                with open(vap, 'r', encoding='utf-8') as f:
-                    pattern = r'"([^"]+):/[^"]*"'
-                    occurences = set(re.findall(pattern, f.read()))
+                # Map the file instead of reading it so large presets aren't copied into memory
+                with open(vap, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size == 0:
+                        continue
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        # The regex can't match without this literal, and most presets don't have one
+                        if data.find(b':/') < 0:
+                            continue
+                        occurences = {match.group(1).decode('utf-8', 'ignore') for match in _PRESET_RE.finditer(data)}
             except Exception as error:
                 dpPrint(f"ERROR, failed to read: {vap}: {error}", args.output)
                 continue
@@ -88,13 +282,10 @@ def getPresetDependencies(customPath: str) -> dict:
                     presetName = '/'.join(parts[custom_index+1:])
                 else:
                     presetName = basename(vap)
+                presetName = sys.intern(presetName)
                     
-                dependenciesDict = {key: {presetName} for key in occurences}
-                for key, val in dependenciesDict.items():
-                    if key in allDependencies:
-                        allDependencies[key].update(val)
-                    else:
-                        allDependencies[key] = val
+                for key in occurences:
+                    allDependencies[key].add(presetName)
             except Exception as error:
                 dpPrint(f"ERROR processing preset dependencies in {vap}: {error}", args.output)
                 continue
@@ -102,36 +293,59 @@ def getPresetDependencies(customPath: str) -> dict:
         dpPrint(f"ERROR in getPresetDependencies: {error}", args.output)
         dpPrint(traceback.format_exc(), args.output)
     
-    return allDependencies
+    return dict(allDependencies)
 
-# Collect all vars, a complete list of all dependencies, and which vars uses which dependency
-def getAllVars(directoryPath: str) -> tuple[set, dict]:
-    allDependencies = {}
+# Collect all vars, a complete list of all dependencies, and which vars uses which dependency.
+# Vars already found by scanVamFolder can be passed in to skip searching again
+def getAllVars(directoryPath: str, vars: list|None = None) -> tuple[set, dict]:
+    allDependencies = defaultdict(set)
     allVarList = set()
 
     try:
-        addon_path = join(directoryPath, 'AddonPackages')
-        if not exists(addon_path):
-            dpPrint(f"WARNING: AddonPackages path does not exist: {addon_path}", args.output)
-            # Try directly in the directory instead
-            vars = safe_glob(join(directoryPath, '**/*.var'))
-        else:
-            vars = safe_glob(join(addon_path, '**/*.var'))
+        if vars is None:
+            vars, _ = scanVamFolder(directoryPath, includePresets=False)
         
         dpPrint(f"Found {len(vars)} var files to process", args.output)
         
+        # Work out each var's file name once, it's needed for both the var list and the dependents
+        varBasenames = {}
         for var in vars:
             try:
-                allVarList.add(splitext(basename(var))[0])
+                # Interned since the same name ends up in many dependents sets
+                var_basename = sys.intern(basename(var))
+                varBasenames[var] = var_basename
+                allVarList.add(splitext(var_basename)[0])
             except Exception as e:
                 dpPrint(f"ERROR processing filename {var}: {e}", args.output)
 
+        # Reading meta.json is independent per var, so spread it over a process pool.
+        # Results are merged back in the original order to keep the output stable.
+        folders = []
+        archives = []
+        for var in vars:
+            (folders if isdir(var) else archives).append(var)
+        results = {}
+        try:
+            with ProcessPoolExecutor(mp_context=_POOL_CONTEXT) as executor:
+                for varFilename, result in zip(folders, executor.map(getMetaDependencies, folders, chunksize=32)):
+                    results[varFilename] = result
+                for varFilename, result in zip(archives, executor.map(getDependencies, archives, chunksize=32)):
+                    results[varFilename] = result
+        except Exception as error:
+            # A dead worker (e.g. killed for running out of memory) breaks the whole pool.
+            # Read whatever is left here instead, a partial dependency map would make vars
+            # that are in use look unused
+            dpPrint(f"WARNING: Parallel read failed ({error!r}), reading the remaining {len(vars) - len(results)} vars directly", args.output)
+            for varFilename in folders:
+                if varFilename not in results:
+                    results[varFilename] = getMetaDependencies(varFilename)
+            for varFilename in archives:
+                if varFilename not in results:
+                    results[varFilename] = getDependencies(varFilename)
+
         for varFilename in vars:
             try:
-                if isdir(varFilename):
-                    error, dependencies = getMetaDependencies(varFilename)
-                else:
-                    error, dependencies = getDependencies(varFilename)
+                error, dependencies = results[varFilename]
 
                 if (isinstance(error, Exception)):
                     dpPrint(f"ERROR: {varFilename}: {error}", args.output)
@@ -140,13 +354,9 @@ def getAllVars(directoryPath: str) -> tuple[set, dict]:
                 if (len(dependencies) == 0):
                     continue
 
-                var_basename = basename(varFilename)
-                dependenciesDict = {key: {var_basename} for key in dependencies}
-                for key, val in dependenciesDict.items():
-                    if key in allDependencies:
-                        allDependencies[key].update(val)
-                    else:
-                        allDependencies[key] = val
+                var_basename = varBasenames[varFilename]
+                for key in dependencies:
+                    allDependencies[key].add(var_basename)
             except Exception as e:
                 dpPrint(f"ERROR processing dependencies for {varFilename}: {e}", args.output)
                 continue
@@ -154,97 +364,109 @@ def getAllVars(directoryPath: str) -> tuple[set, dict]:
         dpPrint(f"ERROR in getAllVars: {error}", args.output)
         dpPrint(traceback.format_exc(), args.output)
 
-    return allVarList, allDependencies
+    return allVarList, dict(allDependencies)
 
 # Get all dependencies listed in meta.json stored directly in folders
 def getMetaDependencies(folder: str) -> tuple[Exception|None, set]:
     filename = join(folder, 'meta.json')
     try:
-        with open(filename, 'r', encoding='utf-8') as metaJson:
-            data = load(metaJson)
-
-        if 'dependencies' not in data:
-            return None, set()
-        return None, set(data['dependencies'].keys())
+        with open(filename, 'rb') as metaJson:
+            return None, getDependencyKeys(metaJson.read())
     except Exception as error:
         return error, set()
 
+# Index var names for dependency lookups. Takes (name, value) pairs and returns
+# a dict of exact names and a dict of base names to the (version, value) pair of
+# their highest version
+def buildVarIndex(entries) -> tuple[dict, dict]:
+    exactIndex = {}
+    versionIndex = {}
+    for name, value in entries:
+        exactIndex.setdefault(name, value)
+        baseName, _, version = name.rpartition('.')
+        if baseName and version.isdigit():
+            try:
+                candidate = (int(version), value)
+            except ValueError:
+                continue
+            # Only the highest version is ever looked up, so keep a running max
+            highest = versionIndex.get(baseName)
+            if highest is None or candidate > highest:
+                versionIndex[baseName] = candidate
+
+    return exactIndex, versionIndex
+
 # Find the best match for a dependency in source files
-def find_dependency_match(dependency, sourceVarFiles):
+def find_dependency_match(dependency, exactIndex, versionIndex):
     # Exact match
-    for source_file in sourceVarFiles:
-        source_name = splitext(basename(source_file))[0]
-        if source_name == dependency:
-            return source_file
+    if dependency in exactIndex:
+        return exactIndex[dependency]
     
     # If dependency ends with .latest, look for the highest version
     if dependency.endswith('.latest'):
-        base_name = dependency[:-7]  # Remove '.latest'
-        matching_files = []
-        
-        for source_file in sourceVarFiles:
-            source_name = splitext(basename(source_file))[0]
-            if source_name.startswith(base_name + '.'):
-                # Get the version number
-                try:
-                    version_part = source_name[len(base_name)+1:]
-                    if version_part.isdigit():
-                        matching_files.append((int(version_part), source_file))
-                except:
-                    pass
-        
-        if matching_files:
-            # Sort by version number (highest first)
-            matching_files.sort(reverse=True)
-            return matching_files[0][1]
+        highest = versionIndex.get(dependency[:-7])
+        if highest:
+            return highest[1]
     
     # Try to find any version of the dependency
     parts = dependency.split('.')
     if len(parts) > 1:
-        base_name = '.'.join(parts[:-1])
-        matching_files = []
-        
-        for source_file in sourceVarFiles:
-            source_name = splitext(basename(source_file))[0]
-            if source_name.startswith(base_name + '.'):
-                try:
-                    version_part = source_name[len(base_name)+1:]
-                    if version_part.isdigit():
-                        matching_files.append((int(version_part), source_file))
-                except:
-                    pass
-        
-        if matching_files:
-            # Sort by version number (highest first)
-            matching_files.sort(reverse=True)
-            return matching_files[0][1]
+        highest = versionIndex.get('.'.join(parts[:-1]))
+        if highest:
+            return highest[1]
     
     return None
 
+# Copy a file with its metadata like shutil.copy2, letting the kernel do the copy through
+# copy_file_range where available (a reflink on filesystems that support it)
+def fast_copy(src: str, dst: str):
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                shutil.copystat(src, dst)
+                return
+        except OSError:
+            # Not supported between these files, copy the regular way below
+            pass
+
+    shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+
 def checkMissingReferences(mainPath: str, sourcePath: str, destPath: str = None) -> dict:
     try:
-        dpPrint(f"Getting dependencies from main path: {mainPath}", args.output)
-        mainVarList, mainDependencies = getAllVars(mainPath)
-        dpPrint(f"Found {len(mainDependencies)} dependencies in main path", args.output)
-        dpPrint(f"Found {len(mainVarList)} var files in main path", args.output)
-        
-        dpPrint(f"Getting available var files from source path: {sourcePath}", args.output)
-        # Don't require AddonPackages folder in source directory
-        sourceVarFiles = safe_glob(join(sourcePath, '**/*.var'))
+        # The source walk doesn't depend on the main path, so run it in the background
+        # while the main vars are read. Don't require AddonPackages folder in source directory
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # Only collect the files in the worker, any warning is printed from this thread
+            sourceSearch = executor.submit(lambda: list(iter_files(sourcePath, '.var')))
+
+            dpPrint(f"Getting dependencies from main path: {mainPath}", args.output)
+            mainVarList, mainDependencies = getAllVars(mainPath)
+            dpPrint(f"Found {len(mainDependencies)} dependencies in main path", args.output)
+            dpPrint(f"Found {len(mainVarList)} var files in main path", args.output)
+            
+            dpPrint(f"Getting available var files from source path: {sourcePath}", args.output)
+            try:
+                sourceVarFiles = sourceSearch.result()
+            except Exception as e:
+                dpPrint(f"WARNING: Error while searching for .var files in {sourcePath}: {e}", args.output)
+                sourceVarFiles = []
         dpPrint(f"Found {len(sourceVarFiles)} var files in source path", args.output)
         
-        sourceVarList = set()
-        sourceVarDict = {}  # Map names to file paths
+        # Name and index the source vars in a single pass
+        sourceExactIndex, sourceVersionIndex = buildVarIndex((splitext(basename(var))[0], var) for var in sourceVarFiles)
         
-        for var in sourceVarFiles:
-            try:
-                var_name = splitext(basename(var))[0]
-                sourceVarList.add(var_name)
-                sourceVarDict[var_name] = var
-            except Exception as e:
-                dpPrint(f"ERROR processing source filename {var}: {e}", args.output)
+        dpPrint(f"Processing {len(sourceExactIndex)} unique var names from source", args.output)
         
-        dpPrint(f"Processing {len(sourceVarList)} unique var names from source", args.output)
+        # Index the main vars so satisfied dependencies are found without a scan
+        _, mainVersionIndex = buildVarIndex((var_name, var_name) for var_name in mainVarList)
         
         # Create destination directory if needed and copying is enabled
         if destPath:
@@ -255,6 +477,7 @@ def checkMissingReferences(mainPath: str, sourcePath: str, destPath: str = None)
         missingRefs = {}
         foundRefs = {}
         alreadySatisfiedRefs = {}
+        copyJobs = {}  # Map destination files to the source file and its name
         
         for dependency, dependents in mainDependencies.items():
             try:
@@ -262,24 +485,24 @@ def checkMissingReferences(mainPath: str, sourcePath: str, destPath: str = None)
                 if not dependency or dependency.isspace():
                     continue
                 
-                # Check if dependency already exists in the main path
-                dependency_already_exists = False
-                for var_name in mainVarList:
-                    if var_name == dependency or (dependency.endswith('.latest') and var_name.startswith(dependency[:-7])):
-                        dependency_already_exists = True
-                        alreadySatisfiedRefs[dependency] = {
-                            'satisfied_by': var_name,
-                            'dependents': dependents
-                        }
-                        break
+                # Check if dependency already exists in the main path, two dict lookups at most
+                satisfied_by = None
+                if dependency in mainVarList:
+                    satisfied_by = dependency
+                elif dependency.endswith('.latest') and dependency[:-7] in mainVersionIndex:
+                    satisfied_by = mainVersionIndex[dependency[:-7]][1]
                 
-                if dependency_already_exists:
+                if satisfied_by is not None:
+                    alreadySatisfiedRefs[dependency] = {
+                        'satisfied_by': satisfied_by,
+                        'dependents': dependents
+                    }
                     if args.verbose:
                         dpPrint(f"Dependency already satisfied: {dependency}", args.output)
                     continue
                 
                 # Find the best matching file for this dependency
-                match_file = find_dependency_match(dependency, sourceVarFiles)
+                match_file = find_dependency_match(dependency, sourceExactIndex, sourceVersionIndex)
                 
                 if match_file:
                     # We found a match
@@ -290,19 +513,29 @@ def checkMissingReferences(mainPath: str, sourcePath: str, destPath: str = None)
                     
                     # Copy file if destPath is provided
                     if destPath:
-                        dest_file = join(destPath, basename(match_file))
-                        if not exists(dest_file):
-                            try:
-                                shutil.copy2(match_file, dest_file)
-                                dpPrint(f"Copied: {basename(match_file)} -> {dest_file}", args.output)
-                            except Exception as e:
-                                dpPrint(f"ERROR copying {match_file} to {dest_file}: {e}", args.output)
+                        match_basename = basename(match_file)
+                        dest_file = join(destPath, match_basename)
+                        if dest_file not in copyJobs and not exists(dest_file):
+                            copyJobs[dest_file] = (match_file, match_basename)
                 else:
                     # No match found
                     missingRefs[dependency] = dependents
             except Exception as e:
                 dpPrint(f"ERROR checking dependency {dependency}: {e}", args.output)
                 continue
+        
+        # Copy the found dependencies, a few at a time since disk IO overlaps well
+        if copyJobs:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                copies = {dest_file: executor.submit(fast_copy, match_file, dest_file)
+                          for dest_file, (match_file, _) in copyJobs.items()}
+                for dest_file, copy in copies.items():
+                    match_file, match_basename = copyJobs[dest_file]
+                    try:
+                        copy.result()
+                        dpPrint(f"Copied: {match_basename} -> {dest_file}", args.output)
+                    except Exception as e:
+                        dpPrint(f"ERROR copying {match_file} to {dest_file}: {e}", args.output)
                 
         # Report statistics
         dpPrint(f"Dependencies already satisfied: {len(alreadySatisfiedRefs)}", args.output)
@@ -453,26 +686,23 @@ def main():
                 print(f"\nResults saved to: {args.output}")
             return 0
 
+    # Find all vars and presets in one pass over the folder
+    varFiles, presetFiles = scanVamFolder(args.path)
+
     # Get a list of all vars and a dict of all dependencies from vars
-    allVarList, allVarDependencies = getAllVars(args.path)
-    allDepVars = list(allVarDependencies.keys())
+    allVarList, allVarDependencies = getAllVars(args.path, varFiles)
 
     # Get a dict of all dependencies from presets
-    allPresetDependencies = getPresetDependencies(args.path)
-    allDepVarsPresets = list(allPresetDependencies.keys())
+    allPresetDependencies = getPresetDependencies(args.path, presetFiles)
 
     # Combine all dependencies
-    allDependencies = {**allVarDependencies}
+    allDependencies = defaultdict(set, allVarDependencies)
     for key, val in allPresetDependencies.items():
-        if key in allDependencies:
-            allDependencies[key].update(val)
-        else:
-            allDependencies[key] = val
+        allDependencies[key].update(val)
 
     # Get a list of which vars in the folder that are not used as a dependency
-    noDependencyVar = [var for var in allVarList if not check_name_variation(var, allDepVars)]
-    noDependencyPreset = [var for var in allVarList if not check_name_variation(var, allDepVarsPresets)]
-    noDependency = sorted(list(set(noDependencyVar) & set(noDependencyPreset)), key=str.lower)
+    # by vars or presets, checked against the combined dependencies in a single pass
+    noDependency = sorted((var for var in allVarList if not check_name_variation(var, allDependencies)), key=str.lower)
 
     # If no name is given, list all vars that aren't used as a dependency
     if args.name == '':
@@ -483,25 +713,26 @@ def main():
             print(f"\nResults saved to: {args.output}")
         return 0
 
+    nameLower = args.name.lower()
+
     # List all vars with the given name that aren't used as a dependency
-    foundVars = [var for var in noDependency if args.name.lower() in var.lower()]
+    foundVars = [var for var in noDependency if nameLower in var.lower()]
     if len(foundVars) > 0:
         dpPrint(f"The following {str(len(foundVars)) + ' vars are' if len(foundVars) > 1 else 'var is'} not used as a dependency in other vars:", args.output)
         for var in foundVars:
             dpPrint("\t" + var, args.output)
 
     # List all vars with the given name that depend on other vars
-    foundDepVars = sorted([var for var in allDependencies.keys() if args.name.lower() in var.lower()], key=str.lower)
+    foundDepVars = sorted([var for var in allDependencies.keys() if nameLower in var.lower()], key=str.lower)
     if len(foundDepVars) > 0:
         dpPrint(f"\nThe following {len(foundDepVars)} iteration{'s' if len(foundDepVars) > 1 else ''} of '" + args.name + "' has other vars that depend on it:", args.output)
 
         # print all dependencies where the name is a key, or the name is part of the key
         for key in foundDepVars:
-            if args.name.lower() in key.lower():
-                if args.name != key:
-                    dpPrint(f"{key} ->", args.output)
-                for var in sorted(allDependencies[key], key=str.lower):
-                    dpPrint("\t" + var, args.output)
+            if args.name != key:
+                dpPrint(f"{key} ->", args.output)
+            for var in sorted(allDependencies[key], key=str.lower):
+                dpPrint("\t" + var, args.output)
 
     if args.output:
         print(f"\nResults saved to: {args.output}")